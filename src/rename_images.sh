@@ -12,6 +12,7 @@ set -euo pipefail
 DEFAULT_SOURCE_DIR="public/bg-finals-4x"
 DEFAULT_MAPPING_FILE="data/image_mapping.json"
 DEFAULT_OUTPUT_DIR="renamed_images"
+DEFAULT_JOBS=1
 LOG_FILE="output/rename_report.txt"
 UNKNOWN_PREFIX="_unknown__needs-review"
 VERSION_SEPARATOR="__v"
@@ -30,6 +31,14 @@ UNKNOWN_COUNT=0
 ERROR_COUNT=0
 SKIPPED_COUNT=0
 
+# Target reservation and worker pool state
+JOBS=$DEFAULT_JOBS
+declare -A RESERVED_TARGETS
+RESERVED_NAME=""
+RESERVED_VERSION=1
+PLANNED_KIND=""
+RESULTS_FILE=""
+
 # Helper functions
 log_message() {
     local message="$1"
@@ -158,83 +167,102 @@ get_product_mapping() {
     echo "$mapping"
 }
 
-detect_duplicate_targets() {
+reserve_target() {
     local base_name="$1"
     local output_dir="$2"
     local version=1
+    local candidate="${base_name}.png"
     
-    while [ -f "${output_dir}/${base_name}${VERSION_SEPARATOR}${version}.png" ] || \
-          [ -f "${output_dir}/${base_name}.png" ] && [ $version -eq 1 ]; do
+    # Claim the first name not taken on disk or by an earlier reservation.
+    # The result is returned in RESERVED_NAME/RESERVED_VERSION (not echoed)
+    # so the reservation survives in the calling shell.
+    while [ -n "${RESERVED_TARGETS[$candidate]:-}" ] || [ -e "${output_dir}/${candidate}" ]; do
         version=$((version + 1))
+        candidate="${base_name}${VERSION_SEPARATOR}${version}.png"
     done
     
-    # If version 1 file doesn't exist, use version 1
-    if [ $version -eq 1 ] && [ ! -f "${output_dir}/${base_name}.png" ]; then
-        echo 1
-    else
-        echo $version
-    fi
+    RESERVED_TARGETS["$candidate"]=1
+    RESERVED_NAME="$candidate"
+    RESERVED_VERSION=$version
 }
 
-rename_image() {
+plan_target() {
     local src_file="$1"
     local output_dir="$2"
-    local mapping="$3"
+    local filename
+    filename=$(basename "$src_file")
+    local product_id category product_name confidence version notes
     
-    # Parse mapping components
-    IFS=':' read -r product_id category product_name confidence version notes <<< "$mapping"
+    # Classify the file and reserve its target name. Sets PLANNED_KIND to
+    # renamed, unknown, unmapped or skipped; the target is in RESERVED_NAME.
+    local mapping
+    mapping=$(get_product_mapping "$filename") || true
     
-    # Check if this is an unknown image
-    if [ -z "$product_id" ] && [ -z "$category" ] && [ -z "$product_name" ]; then
-        UNKNOWN_COUNT=$((UNKNOWN_COUNT + 1))
-        local target_name="${UNKNOWN_PREFIX}_${UNKNOWN_COUNT}.png"
-        
-        if cp "$src_file" "${output_dir}/${target_name}"; then
-            log_success "Copied unknown image: $src_file → $target_name"
+    if [ -z "$mapping" ]; then
+        PLANNED_KIND="unmapped"
+    else
+        IFS=':' read -r product_id category product_name confidence version notes <<< "$mapping"
+        if [ -z "$product_id" ] && [ -z "$category" ] && [ -z "$product_name" ]; then
+            PLANNED_KIND="unknown"
+        elif [ -z "$category" ] || [ -z "$product_name" ]; then
+            log_warning "Incomplete mapping for $src_file (missing category or product name)"
+            SKIPPED_COUNT=$((SKIPPED_COUNT + 1))
+            PLANNED_KIND="skipped"
             return 0
         else
-            log_error "Failed to copy unknown image: $src_file"
-            ERROR_COUNT=$((ERROR_COUNT + 1))
-            return 1
+            PLANNED_KIND="renamed"
         fi
     fi
     
-    # Validate required fields
-    if [ -z "$category" ] || [ -z "$product_name" ]; then
-        log_warning "Incomplete mapping for $src_file (missing category or product name)"
-        SKIPPED_COUNT=$((SKIPPED_COUNT + 1))
-        return 1
-    fi
-    
-    # Clean the product name for filename
-    local clean_name
-    clean_name=$(clean_filename "$product_name")
-    
-    # Create base filename
-    local base_name="${category}__${clean_name}"
-    
-    # Check for duplicates and get appropriate version
-    local final_version
-    final_version=$(detect_duplicate_targets "$base_name" "$output_dir")
-    
-    # Construct final target name
-    local target_name
-    if [ "$final_version" -eq 1 ]; then
-        target_name="${base_name}.png"
+    if [ "$PLANNED_KIND" = "renamed" ]; then
+        reserve_target "${category}__$(clean_filename "$product_name")" "$output_dir"
     else
-        target_name="${base_name}${VERSION_SEPARATOR}${final_version}.png"
+        UNKNOWN_COUNT=$((UNKNOWN_COUNT + 1))
+        RESERVED_NAME="${UNKNOWN_PREFIX}_${UNKNOWN_COUNT}.png"
+        RESERVED_VERSION=1
+        RESERVED_TARGETS["$RESERVED_NAME"]=1
     fi
-    
-    # Perform the copy/rename
-    if cp "$src_file" "${output_dir}/${target_name}"; then
-        RENAMED_COUNT=$((RENAMED_COUNT + 1))
-        log_success "Renamed: $src_file → $target_name (v${final_version})"
-        return 0
+}
+
+materialize_target() {
+    local src_file="$1"
+    local target_path="$2"
+    local kind="$3"
+    local version="$4"
+    local results_file="$5"
+    local target_name
+    target_name=$(basename "$target_path")
+    
+    # Runs as a pool worker: disable errexit so a logging failure cannot
+    # drop the outcome, and record the outcome before logging it
+    set +e
+    if cp "$src_file" "$target_path"; then
+        printf '%s\t%s\n' "$kind" "$target_name" >> "$results_file"
+        case $kind in
+            renamed) log_success "Renamed: $src_file → $target_name (v${version})" ;;
+            unknown) log_success "Copied unknown image: $src_file → $target_name" ;;
+            unmapped) log_warning "No mapping found for $(basename "$src_file") → $target_name" ;;
+        esac
     else
-        log_error "Failed to rename: $src_file → $target_name"
-        ERROR_COUNT=$((ERROR_COUNT + 1))
-        return 1
+        printf 'error\t%s\n' "$target_name" >> "$results_file"
+        case $kind in
+            renamed) log_error "Failed to rename: $src_file → $target_name" ;;
+            unknown) log_error "Failed to copy unknown image: $src_file" ;;
+            unmapped) log_error "Failed to copy unmapped image: $(basename "$src_file")" ;;
+        esac
     fi
+    return 0
+}
+
+cleanup_workers() {
+    local pid
+    # Stop each worker's running cp before the worker itself, otherwise
+    # the cp is orphaned and keeps writing after we exit
+    for pid in $(jobs -p); do
+        pkill -P "$pid" 2>/dev/null || true
+        kill "$pid" 2>/dev/null || true
+    done
+    rm -f "$RESULTS_FILE"
 }
 
 process_images() {
@@ -242,7 +270,7 @@ process_images() {
     local output_dir="$2"
     local mapping_file="$3"
     
-    log_info "Starting image processing..."
+    log_info "Starting image processing ($JOBS worker(s))..."
     log_info "Source directory: $source_dir"
     log_info "Output directory: $output_dir"
     log_info "Mapping file: $mapping_file"
@@ -253,42 +281,63 @@ process_images() {
     # Load mapping data
     load_mapping "$mapping_file"
     
-    # Process each file in source directory
-    local processed=0
-    # Use find to handle cases where no files match the pattern
+    # Pass 1: reserve every target name serially, in sorted order, so
+    # __vN numbering does not depend on the job count or worker scheduling
+    local -a plan_src=()
+    local -a plan_target=()
+    local -a plan_kind=()
+    local -a plan_version=()
     while IFS= read -r -d '' src_file; do
-        local filename
-        filename=$(basename "$src_file")
         TOTAL_FILES=$((TOTAL_FILES + 1))
         
-        # Get mapping for this file
-        local mapping
-        mapping=$(get_product_mapping "$filename")
-        
-        if [ -n "$mapping" ]; then
-            rename_image "$src_file" "$output_dir" "$mapping"
-        else
-            # No mapping found - treat as unknown
-            UNKNOWN_COUNT=$((UNKNOWN_COUNT + 1))
-            local target_name="${UNKNOWN_PREFIX}_${UNKNOWN_COUNT}.png"
-            
-            if cp "$src_file" "${output_dir}/${target_name}"; then
-                log_warning "No mapping found for $filename → $target_name"
-            else
-                log_error "Failed to copy unmapped image: $filename"
-                ERROR_COUNT=$((ERROR_COUNT + 1))
-            fi
+        plan_target "$src_file" "$output_dir"
+        if [ "$PLANNED_KIND" = "skipped" ]; then
+            continue
         fi
         
-        processed=$((processed + 1))
+        plan_src+=("$src_file")
+        plan_target+=("${output_dir}/${RESERVED_NAME}")
+        plan_kind+=("$PLANNED_KIND")
+        plan_version+=("$RESERVED_VERSION")
+    done < <(find "$source_dir" -type f \( -name "*.png" -o -name "*.jpg" -o -name "*.jpeg" \) -print0 | sort -z)
+    
+    log_info "Reserved ${#plan_src[@]} target names"
+    
+    # Pass 2: copy files with at most $JOBS workers in flight
+    RESULTS_FILE=$(mktemp)
+    trap cleanup_workers EXIT
+    trap 'exit 1' INT TERM
+    
+    local running=0
+    local i
+    for i in "${!plan_src[@]}"; do
+        if [ $running -ge "$JOBS" ]; then
+            wait -n || true
+            running=$((running - 1))
+        fi
+        materialize_target "${plan_src[$i]}" "${plan_target[$i]}" "${plan_kind[$i]}" "${plan_version[$i]}" "$RESULTS_FILE" &
+        running=$((running + 1))
         
         # Progress indicator
-        if [ $((processed % 10)) -eq 0 ]; then
-            log_info "Processed $processed files..."
+        if [ $(((i + 1) % 10)) -eq 0 ]; then
+            log_info "Dispatched $((i + 1)) files..."
         fi
-    done < <(find "$source_dir" -type f \( -name "*.png" -o -name "*.jpg" -o -name "*.jpeg" \) -print0)
+    done
+    wait
+    
+    # Aggregate worker outcomes into the global counters
+    local kind target_name
+    while IFS=$'\t' read -r kind target_name; do
+        case $kind in
+            renamed) RENAMED_COUNT=$((RENAMED_COUNT + 1)) ;;
+            error) ERROR_COUNT=$((ERROR_COUNT + 1)) ;;
+        esac
+    done < "$RESULTS_FILE"
     
-    log_info "Processing complete. Total files processed: $processed"
+    cleanup_workers
+    trap - EXIT INT TERM
+    
+    log_info "Processing complete. Total files processed: ${#plan_src[@]}"
 }
 
 generate_report() {
@@ -330,12 +379,14 @@ print_usage() {
     echo "  -s, --source DIR     Source directory containing images (default: $DEFAULT_SOURCE_DIR)"
     echo "  -m, --mapping FILE   Mapping JSON file (default: $DEFAULT_MAPPING_FILE)"
     echo "  -o, --output DIR     Output directory for renamed images (default: $DEFAULT_OUTPUT_DIR)"
+    echo "  -j, --jobs N         Copy files with N parallel workers (default: $DEFAULT_JOBS)"
     echo "  -h, --help           Show this help message"
     echo ""
     echo "Examples:"
     echo "  $0"
     echo "  $0 --source public/bg-finals-4x --mapping data/image_mapping.json"
     echo "  $0 --output renamed_doors"
+    echo "  $0 --jobs \$(nproc)"
 }
 
 main() {
@@ -358,6 +409,10 @@ main() {
                 output_dir="$2"
                 shift 2
                 ;;
+            -j|--jobs)
+                JOBS="$2"
+                shift 2
+                ;;
             -h|--help)
                 print_usage
                 exit 0
@@ -391,6 +446,11 @@ main() {
         exit 1
     fi
     
+    if ! [[ "$JOBS" =~ ^[1-9][0-9]*$ ]]; then
+        log_error "Invalid job count: $JOBS (must be a positive integer)"
+        exit 1
+    fi
+    
     # Process images
     process_images "$source_dir" "$output_dir" "$mapping_file"
     
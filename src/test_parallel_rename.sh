@@ -0,0 +1,98 @@
+#!/bin/bash
+
+# Check that the job count does not change the renaming result:
+# runs rename_images.sh with -j 1 and -j 4 on the same fixture and
+# compares the produced files and the summary counters.
+
+set -euo pipefail
+
+SCRIPT_DIR="$(cd "$(dirname "$0")" && pwd)"
+RENAME_SCRIPT="$SCRIPT_DIR/rename_images.sh"
+
+echo "Testing parallel rename consistency..."
+
+# Work in a scratch directory so the script's log file stays out of the tree
+TEST_DIR=$(mktemp -d)
+trap 'rm -rf "$TEST_DIR"' EXIT
+cd "$TEST_DIR"
+mkdir -p source
+
+# Create test files: each file holds its own name so copies can be compared
+for i in $(seq -w 1 25); do
+    echo "image $i" > "source/img$i.png"
+done
+
+# Mapping: several duplicate product names, one unknown entry, one
+# incomplete entry; the remaining files are unmapped
+{
+    echo '{'
+    echo '  "images": ['
+    for i in $(seq -w 1 20); do
+        case $((10#$i % 3)) in
+            0) echo "    {\"filename\": \"img$i.png\", \"product_id\": \"W$i\", \"category\": \"wood\", \"product_name\": \"Door A\"}," ;;
+            1) echo "    {\"filename\": \"img$i.png\", \"product_id\": \"I$i\", \"category\": \"iron\", \"product_name\": \"Gate B\"}," ;;
+            2) echo "    {\"filename\": \"img$i.png\", \"product_id\": \"F$i\", \"category\": \"fiberglass\", \"product_name\": \"Entry C\"}," ;;
+        esac
+    done
+    echo '    {"filename": "img21.png", "product_id": "", "category": "", "product_name": ""},'
+    echo '    {"filename": "img22.png", "product_id": "X22", "category": "wood", "product_name": ""}'
+    echo '  ]'
+    echo '}'
+} > mapping.json
+
+run_rename() {
+    local jobs="$1"
+    local output_dir="out_j${jobs}"
+    mkdir -p "$output_dir"
+    # A pre-existing target must be kept and skipped over
+    echo "existing" > "$output_dir/wood__door-a.png"
+    if ! bash "$RENAME_SCRIPT" -s source -m mapping.json -o "$output_dir" -j "$jobs" > /dev/null; then
+        echo "  FAIL: rename with -j $jobs exited with an error"
+        failed=1
+    fi
+}
+
+failed=0
+run_rename 1
+run_rename 4
+
+echo ""
+echo "Comparing produced files:"
+if diff <(cd out_j1 && ls | grep -v '^rename_summary.txt$') \
+        <(cd out_j4 && ls | grep -v '^rename_summary.txt$'); then
+    echo "  Same target names ($(ls out_j1 | grep -vc '^rename_summary.txt$') files)"
+else
+    echo "  FAIL: target names differ"
+    failed=1
+fi
+
+for file in out_j1/*; do
+    name=$(basename "$file")
+    [ "$name" = "rename_summary.txt" ] && continue
+    if ! cmp -s "$file" "out_j4/$name"; then
+        echo "  FAIL: contents differ for $name"
+        failed=1
+    fi
+done
+
+echo ""
+echo "Comparing counters:"
+if diff <(grep '^  ' out_j1/rename_summary.txt) <(grep '^  ' out_j4/rename_summary.txt); then
+    grep '^  ' out_j1/rename_summary.txt
+else
+    echo "  FAIL: counters differ"
+    failed=1
+fi
+
+if [ "$(cat out_j1/wood__door-a.png)" != "existing" ]; then
+    echo "  FAIL: pre-existing target was overwritten"
+    failed=1
+fi
+
+echo ""
+if [ $failed -eq 0 ]; then
+    echo "Test passed."
+else
+    echo "Test failed."
+    exit 1
+fi